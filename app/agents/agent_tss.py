@@ -4,78 +4,548 @@ agent_tss.py
 TTSAgent for converting text to speech using LLM APIs.
 """
 
+import os
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, Any, List, Union
-from app.agents.class_agents import MultiModelAgent, ProcessType
+import tempfile
+import unicodedata
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import Optional, Dict, Any, List, Union, Tuple, Set, AsyncIterator, Literal
+import httpx
+import orjson
+from app.agents.class_agents import MultiModelAgent, ProcessType, call_with_retry
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ea_challenge", "tts")
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+# Audio formats accepted by the speech API
+ResponseFormat = Literal["mp3", "opus", "aac", "flac", "wav", "pcm"]
+
+
+def _norm(text: str) -> str:
+    """
+    Normalize text before synthesis and hashing: Unicode NFC and collapsed whitespace.
+    Trivially different spellings of the same phrase then share one cache entry.
+    """
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+class _Abandoned(Exception):
+    """
+    Set on an in-flight request whose owner went away before finishing it,
+    so the callers waiting on it start their own request instead of being cancelled.
+    """
+
+
+class TTSCache:
+    """
+    TTSCache stores synthesized audio on disk, keyed by a SHA-256 hash of (model, voice, format, text).
+    TTS output is deterministic for a fixed model/voice/input, so a hit can skip the API call.
+    """
+    temp_suffix = ".tmp"
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        sweep_every: int = 64,
+        logger: Optional[logging.Logger] = None
+    ) -> None:
+        """
+        Initialize the TTSCache.
+
+        Args:
+            cache_dir (Optional[str]): Cache directory, defaults to TTS_CACHE_DIR or ~/.cache/ea_challenge/tts.
+            max_bytes (int): Total size of cached audio above which the oldest entries are evicted.
+            sweep_every (int): Number of writes after which a curation sweep runs even below max_bytes.
+            logger (Optional[logging.Logger]): Logger instance.
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.cache_dir = cache_dir or os.getenv("TTS_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        self._writes_since_sweep = 0
+        self._approx_bytes = 0
+        self._sweep_task: Optional[asyncio.Task] = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Establish the current cache size once; later writes only track it incrementally
+        self.curate_cache()
+
+    @staticmethod
+    def make_key(model: str, voice: str, text: str, response_format: str = "mp3") -> str:
+        """
+        Build the cache key for a (model, voice, format, text) tuple.
+        The key doubles as the file name, so it carries the matching audio suffix.
+        """
+        # Canonical JSON keeps the encoding unambiguous whatever characters the fields contain
+        canonical = orjson.dumps(
+            {"m": model, "v": voice, "f": response_format, "t": text},
+            option=orjson.OPT_SORT_KEYS
+        )
+        digest = hashlib.sha256(canonical).hexdigest()
+        return f"{digest}.{response_format}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the cached audio for the key, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Refresh the access time explicitly, relatime/noatime mounts do not do it for us
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.logger.warning("Failed to read TTS cache entry %s: %s", key, e)
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store audio for the key. The file is written atomically (temp file + os.replace).
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=self.temp_suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            self.logger.warning("Failed to write TTS cache entry %s: %s", key, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        # Keep put O(1): curation is amortized over many writes instead of running on each one
+        self._writes_since_sweep += 1
+        self._approx_bytes += len(data)
+        if self._writes_since_sweep >= self.sweep_every or self._approx_bytes > self.max_bytes:
+            self._schedule_sweep()
+
+    def _schedule_sweep(self) -> None:
+        """
+        Run curation in the background when called from an event loop, inline otherwise.
+        At most one background sweep runs at a time.
+        """
+        self._writes_since_sweep = 0
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.curate_cache()
+            return
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = loop.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        """
+        Curate the cache in a worker thread so directory scans never block the event loop.
+        """
+        try:
+            await asyncio.to_thread(self.curate_cache)
+        except OSError as e:
+            self.logger.warning("TTS cache sweep failed: %s", e)
+
+    def curate_cache(self) -> None:
+        """
+        Evict least recently accessed entries once the cache exceeds max_bytes,
+        down to 80% of it so that the next sweep is not due right away.
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(self.temp_suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, entry.path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            self._approx_bytes = total
+            return
+
+        low_watermark = self.max_bytes * 0.8
+        entries.sort()
+        for _, size, path in entries:
+            if total <= low_watermark:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._approx_bytes = total
+        self.logger.debug("TTS cache curated down to %d bytes", total)
+
 
 class TTSAgent:
     """
     TTSAgent handles text-to-speech conversion using a specified model.
     """
-    def __init__(self, logger: Optional[logging.Logger] = None) -> None:
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        cache: Optional[TTSCache] = None,
+        memory_cache_size: int = 128,
+        max_batch: int = 16,
+        max_concurrent: int = 32,
+        response_format: ResponseFormat = "mp3",
+        stream_chunk_size: int = 16 * 1024
+    ) -> None:
         """
         Initialize the TTSAgent.
 
         Args:
             logger (Optional[logging.Logger]): Logger instance.
+            cache (Optional[TTSCache]): Disk cache for synthesized audio.
+            memory_cache_size (int): Number of hot phrases kept in memory above the disk cache.
+            max_batch (int): Maximum number of queued TTS requests dispatched together.
+            max_concurrent (int): Maximum number of TTS requests in flight against the API.
+            response_format (ResponseFormat): Audio format requested from the API (mp3, opus, aac, flac, wav, pcm).
+            stream_chunk_size (int): Size of the audio chunks yielded by stream_text_to_speech.
         """
         self.logger = logger or logging.getLogger(__name__)
+        self.cache = cache or TTSCache(logger=self.logger)
+        self._mem_cache: "OrderedDict[Tuple[str, str, str, str], bytes]" = OrderedDict()
+        self._mem_max = memory_cache_size
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.max_batch = max_batch
+        self.max_concurrent = max_concurrent
+        self.stream_chunk_size = stream_chunk_size
+        self._tts_queue: Optional["asyncio.Queue[Tuple[str, str, asyncio.Future]]"] = None
+        self._tts_semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tts_worker: Optional[asyncio.Task] = None
+        self._tts_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
         self.model_tts_converter = "gpt-4o-mini-tts"
-        self.agent_tts_converter = MultiModelAgent(
+        # Pinned explicitly so cache keys stay stable across SDK default changes
+        self.response_format = response_format
+        # The TTS agent is stateless, so every TTSAgent with this model and logger shares one
+        self.agent_tts_converter = MultiModelAgent.get(
             model_name=self.model_tts_converter,
             process_type=ProcessType.TTS,
             logger=self.logger
         )
 
-    async def transform_text_to_speech(self, text: str, voice: str = "nova") -> Optional[bytes]:
+    async def transform_text_to_speech(self, text: str, voice: str = "nova", normalize: bool = True) -> Optional[bytes]:
         """
         Convert text to speech asynchronously using the TTS model.
 
         Args:
             text (str): The text to convert.
             voice (str): The voice to use for TTS.
+            normalize (bool): Normalize whitespace and Unicode form before synthesis.
+                Meant for plain semantic text, pass False for whitespace-sensitive markup such as SSML.
 
         Returns:
             Optional[bytes]: The audio data.
         """
-        response = self.agent_tts_converter.client_model.audio.speech.create(
-            model=self.model_tts_converter,
-            voice=voice,
-            input=text
-        )
+        # The normalized text is both the cache key and the API input,
+        # so cached audio always matches what a fresh call would produce
+        if normalize:
+            text = _norm(text)
+
+        mem_key, key, audio_data = await self._lookup(text, voice)
+        if audio_data is not None:
+            return audio_data
+
+        try:
+            audio_data = await self._synthesize(text, voice)
+        except BaseException as e:
+            self._release(key, e)
+            raise
+        await self._store(mem_key, key, audio_data)
+        return audio_data
+
+    async def stream_text_to_speech(self, text: str, voice: str = "nova", normalize: bool = True) -> AsyncIterator[bytes]:
+        """
+        Convert text to speech and yield the audio while the TTS API is still producing it.
+        Cached phrases are yielded in one piece, streamed audio is cached once complete.
+
+        Args:
+            text (str): The text to convert.
+            voice (str): The voice to use for TTS.
+            normalize (bool): Normalize whitespace and Unicode form before synthesis.
+
+        Yields:
+            bytes: Chunks of audio data.
+        """
+        if normalize:
+            text = _norm(text)
+
+        mem_key, key, audio_data = await self._lookup(text, voice)
+        if audio_data is not None:
+            yield audio_data
+            return
+
+        parts: List[bytes] = []
+        try:
+            async for chunk in self._request_speech_stream(text, voice):
+                parts.append(chunk)
+                yield chunk
+        except BaseException as e:
+            self._release(key, e)
+            raise
+        await self._store(mem_key, key, b"".join(parts))
+
+    async def _lookup(self, text: str, voice: str) -> Tuple[Tuple[str, str, str, str], str, Optional[bytes]]:
+        """
+        Look a phrase up in memory, in flight and on disk, in that order.
+        On a miss the phrase is left claimed as in flight, and the caller must settle
+        the claim with _store or _release.
+
+        Returns:
+            Tuple[Tuple[str, str, str, str], str, Optional[bytes]]: The memory key, the disk key
+                and the audio data, None on a miss.
+        """
+        mem_key = (self.model_tts_converter, voice, self.response_format, text)
+        key = self.cache.make_key(self.model_tts_converter, voice, text, self.response_format)
+        audio_data = self._mem_get(mem_key)
+        if audio_data is not None:
+            return mem_key, key, audio_data
+
+        # Single-flight: concurrent requests for the same phrase share one upstream call
+        audio_data = await self._await_inflight(key)
+        if audio_data is not None:
+            return mem_key, key, audio_data
+
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            # Disk I/O runs in a worker thread so other connections keep sending meanwhile
+            audio_data = await asyncio.to_thread(self.cache.get, key)
+        except BaseException as e:
+            self._release(key, e)
+            raise
+        if audio_data is not None:
+            self.logger.debug("TTS cache hit")
+            await self._store(mem_key, key, audio_data, to_disk=False)
+        return mem_key, key, audio_data
+
+    async def _await_inflight(self, key: str) -> Optional[bytes]:
+        """
+        Wait for the in-flight request for key, if any, and return its audio.
+        Returns None when no request is in flight, including when its owner abandoned it.
+        """
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                return None
+            try:
+                shared: bytes = await asyncio.shield(inflight)
+                return shared
+            except _Abandoned:
+                # The owner has already released the key, look again
+                continue
+
+    async def _store(self, mem_key: Tuple[str, str, str, str], key: str, audio_data: bytes, to_disk: bool = True) -> None:
+        """
+        Hand the audio of a claimed phrase to the callers waiting on the claim and cache it.
+        The memory cache serves the phrase while the disk write is still running.
+        """
+        self._mem_put(mem_key, audio_data)
+        self._inflight.pop(key).set_result(audio_data)
+        if to_disk:
+            await asyncio.to_thread(self.cache.put, key, audio_data)
+
+    def _release(self, key: str, error: BaseException) -> None:
+        """
+        Drop the claim on a phrase whose request failed or whose caller went away.
+        Waiters get the error, or _Abandoned on cancellation so that they make their own request.
+        """
+        fut = self._inflight.pop(key)
+        fut.set_exception(error if isinstance(error, Exception) else _Abandoned())
+        # Mark the exception as retrieved in case nobody else was waiting
+        fut.exception()
+
+    def _ensure_tts_worker(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the batch collector for the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._tts_worker is None or self._tts_worker.done() or self._tts_loop is not loop:
+            self._tts_loop = loop
+            self._tts_queue = asyncio.Queue()
+            self._tts_worker = loop.create_task(self._tts_batch_worker(self._tts_queue))
+        return loop
+
+    def _tts_limit(self) -> asyncio.Semaphore:
+        """
+        Return the max_concurrent semaphore for the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._tts_semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore_loop = loop
+            self._tts_semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._tts_semaphore
+
+    async def _synthesize(self, text: str, voice: str) -> bytes:
+        """
+        Queue a TTS request for the batch collector and wait for its audio.
+        """
+        loop = self._ensure_tts_worker()
+        assert self._tts_queue is not None
+        fut: asyncio.Future = loop.create_future()
+        await self._tts_queue.put((text, voice, fut))
+        audio_data: bytes = await fut
+        return audio_data
+
+    async def _tts_batch_worker(self, queue: "asyncio.Queue[Tuple[str, str, asyncio.Future]]") -> None:
+        """
+        Collect the TTS requests queued at the same time into batches of up to max_batch items
+        and dispatch each batch at once.
+        """
+        while True:
+            batch = [await queue.get()]
+            # Take only what is already queued, a request arriving alone is dispatched right away
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            self.logger.debug("Dispatching TTS batch of %d request(s)", len(batch))
+            self._dispatch_batch(batch)
+
+    def _dispatch_batch(self, batch: List[Tuple[str, str, asyncio.Future]]) -> None:
+        """
+        Start every request of a batch in parallel. Each one resolves its own future as soon as
+        it completes, so a short phrase never waits for a slower one batched with it.
+        """
+        loop = asyncio.get_running_loop()
+        for text, voice, fut in batch:
+            task = loop.create_task(self._resolve_request(text, voice, fut))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _resolve_request(self, text: str, voice: str, fut: asyncio.Future) -> None:
+        """
+        Run one queued TTS request and resolve its future, unless the caller has given up on it.
+        """
+        try:
+            audio_data = await self._request_speech(text, voice)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+        else:
+            if not fut.done():
+                fut.set_result(audio_data)
+
+    async def _request_speech(self, text: str, voice: str) -> bytes:
+        """
+        Call the TTS API, bounded by the max_concurrent semaphore.
+        """
+        async with self._tts_limit():
+            response = await call_with_retry(
+                self.agent_tts_converter.client_model.audio.speech.create,
+                model=self.model_tts_converter,
+                voice=voice,
+                input=text,
+                response_format=self.response_format
+            )
         # Get the raw audio data
+        audio_data: bytes = response.content
+        return audio_data
+
+    async def _request_speech_stream(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """
+        Call the TTS API in streaming mode, bounded by the max_concurrent semaphore.
+        """
+        speech = self.agent_tts_converter.client_model.audio.speech
+        async with self._tts_limit(), AsyncExitStack() as stack:
+            # A fresh request per attempt, retries only cover establishing the response
+            response = await call_with_retry(lambda: stack.enter_async_context(
+                speech.with_streaming_response.create(
+                    model=self.model_tts_converter,
+                    voice=voice,
+                    input=text,
+                    response_format=self.response_format
+                )
+            ))
+            async for chunk in response.iter_bytes(self.stream_chunk_size):
+                yield chunk
+
+    def _mem_get(self, key: Tuple[str, str, str, str]) -> Optional[bytes]:
+        """
+        Look up a phrase in the in-memory LRU and mark it as recently used.
+        """
+        audio_data = self._mem_cache.get(key)
+        if audio_data is not None:
+            self._mem_cache.move_to_end(key)
+        return audio_data
+
+    def _mem_put(self, key: Tuple[str, str, str, str], audio_data: bytes) -> None:
+        """
+        Store a phrase in the in-memory LRU, evicting the least recently used ones.
+        """
+        self._mem_cache[key] = audio_data
+        self._mem_cache.move_to_end(key)
+        while len(self._mem_cache) > self._mem_max:
+            self._mem_cache.popitem(last=False)
+
+    async def _transform_private(self, text: str, voice: str, normalize: bool) -> bytes:
+        """
+        Synthesize for text_to_speech on a private HTTP client, closed before its event loop ends.
+        That loop may run in another thread next to the service loop, so the shared connection pool
+        and the loop-bound batching, single-flight and memory cache are left alone, only the disk cache is shared.
+        """
+        if normalize:
+            text = _norm(text)
+        key = self.cache.make_key(self.model_tts_converter, voice, text, self.response_format)
+        audio_data = self.cache.get(key)
+        if audio_data is not None:
+            self.logger.debug("TTS cache hit")
+            return audio_data
+
+        async with httpx.AsyncClient(timeout=30.0) as http_client:
+            speech = self.agent_tts_converter.private_client(http_client).audio.speech
+            response = await call_with_retry(
+                speech.create,
+                model=self.model_tts_converter,
+                voice=voice,
+                input=text,
+                response_format=self.response_format
+            )
         audio_data = response.content
+        self.cache.put(key, audio_data)
         return audio_data
 
-    def text_to_speech(self, text: str, voice: str = "nova") -> Optional[bytes]:
+    def text_to_speech(self, text: str, voice: str = "nova", normalize: bool = True) -> Optional[bytes]:
         """
-        Convert text to speech using OpenAI's TTS API and return the audio data.
+        Convert text to speech from synchronous code and return the audio data.
+        Runs on a private event loop and HTTP client, so it is safe from a worker thread
+        of a running service; async callers must await transform_text_to_speech instead.
 
         Args:
             text (str): The text to convert to speech.
             voice (str): The voice to use (options: alloy, echo, fable, onyx, nova, shimmer).
+            normalize (bool): Normalize whitespace and Unicode form before synthesis.
 
         Returns:
             Optional[bytes]: The audio data.
         """
-        self.logger.debug(f"Starting text-to-speech conversion with voice: {voice}")
-        self.logger.debug(f"Text length: {len(text)} characters")
+        self.logger.debug("Starting text-to-speech conversion with voice: %s", voice)
+        self.logger.debug("Text length: %d characters", len(text))
 
         try:
-            # Generate speech
-            self.logger.debug("Sending request to OpenAI TTS API")
-            response = self.agent_tts_converter.client_model.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
-            self.logger.debug("Received response from OpenAI TTS API")
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("text_to_speech would block the running event loop, await transform_text_to_speech instead")
 
-            # Get the audio data
-            audio_data = response.content
-            self.logger.debug(f"Retrieved audio data: {len(audio_data)} bytes")
+        try:
+            audio_data = asyncio.run(self._transform_private(text, voice, normalize))
+            self.logger.debug("Retrieved audio data: %d bytes", len(audio_data) if audio_data else 0)
             return audio_data
 
         except Exception as e:
-            self.logger.error(f"An error occurred during text-to-speech conversion: {str(e)}")
+            self.logger.error("An error occurred during text-to-speech conversion: %s", e)
             return None
@@ -5,15 +5,33 @@ Defines agent classes for interacting with multiple LLMs and TTS services, used
 """
 
 import os
+import time
+import random
+import asyncio
 import logging
 from enum import Enum
-from typing import List, Dict, Optional, Any, Union, cast
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+from typing import List, Dict, Optional, Any, Union, Tuple, Callable, Awaitable, AsyncIterator, TypeVar, cast
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
+from openai import AsyncOpenAI, AsyncStream, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessageParam
 
 logger = logging.getLogger(__name__)
 
+# Load environment variables for API keys once per process
+load_dotenv(".env")
+
+QWEN_BASE_URL = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+
+# Retry and throttling of API calls, configurable through the environment
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+MAX_REQUESTS_PER_MIN = int(os.getenv("OPENAI_MAX_REQUESTS_PER_MIN", "0"))  # 0 disables throttling
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+T = TypeVar("T")
+
 class ProcessType(Enum):
     """
     Enumeration for different process types (e.g., LLM, TTS, etc.).
@@ -31,6 +49,134 @@ class AIModelType(Enum):
     QWEN = "QWEN"
     CLAUDE = "CLAUDE"
 
+class RateLimiter:
+    """
+    Token bucket limiting the number of API requests started per period.
+    """
+    def __init__(self, rate_limit: int, period: float = 60.0) -> None:
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            rate_limit (int): Requests allowed per period, 0 disables the limiter.
+            period (float): Length of the period in seconds.
+        """
+        self.rate_limit = rate_limit
+        self.period = period
+        self._tokens = float(rate_limit)
+        self._updated = time.monotonic()
+        # One lock per event loop, a lock used on one loop cannot be awaited from another
+        self._locks: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = WeakKeyDictionary()
+
+    async def acquire(self) -> None:
+        """
+        Wait until a request may be started.
+        """
+        if self.rate_limit <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        async with lock:
+            while True:
+                now = time.monotonic()
+                refill = (now - self._updated) * self.rate_limit / self.period
+                self._tokens = min(float(self.rate_limit), self._tokens + refill)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate_limit)
+
+
+_RATE_LIMITER = RateLimiter(MAX_REQUESTS_PER_MIN)
+
+
+async def call_with_retry(fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    """
+    Await an API call under the rate limiter, retrying throttling and transient errors
+    with randomized exponential backoff (up to 30 seconds between attempts).
+
+    Args:
+        fn (Callable[..., Awaitable[T]]): The API coroutine function, e.g. client.chat.completions.create.
+        *args (Any): Positional arguments for the call.
+        **kwargs (Any): Keyword arguments for the call.
+
+    Returns:
+        T: The result of the call.
+    """
+    attempt = 0
+    while True:
+        await _RATE_LIMITER.acquire()
+        try:
+            return await fn(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(30.0, 2.0 ** attempt))
+            logger.warning("API call failed (%s), retry %d/%d in %.1fs", type(e).__name__, attempt, MAX_RETRIES - 1, delay)
+            await asyncio.sleep(delay)
+
+
+_CLIENT_CACHE: Dict[Tuple[Any, ...], AsyncOpenAI] = {}
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide HTTP/2 connection pool shared by all API clients.
+    Chat and TTS requests to the same host are multiplexed over one TLS connection.
+    Its connections belong to the event loop that opened them, close it before that loop ends.
+    """
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=256, max_keepalive_connections=64),
+            timeout=30.0
+        )
+    return _HTTP_CLIENT
+
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP connection pool. Call on service shutdown.
+    """
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+    _CLIENT_CACHE.clear()
+
+
+def _get_client(model_type: AIModelType, api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return a shared API client, so agents reuse its connection pool instead of building their own.
+
+    Args:
+        model_type (AIModelType): Provider family of the client.
+        api_key (str): API key for the provider.
+        base_url (Optional[str]): Custom endpoint for OpenAI-compatible providers.
+
+    Returns:
+        AsyncOpenAI: The cached client.
+    """
+    key = (model_type, api_key, base_url)
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        # Retries are handled by call_with_retry, disable the SDK ones to avoid multiplying them
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=_get_http_client()
+        )
+        _CLIENT_CACHE[key] = client
+    return client
+
+
 class MultiModelAgent:
     """
     A class to interact with multiple models (OpenAI, Qwen, etc.) and provide responses.
@@ -38,7 +184,6 @@ class MultiModelAgent:
     """
     model_type: AIModelType
     model_name: str
-    history: List[Dict[str, str]] = []
 
     def __init__(
         self, 
@@ -67,7 +212,11 @@ class MultiModelAgent:
             voice (str): Voice to use for TTS.
         """
         self.model_name = model_name
-        self.system_prompt = [self.message_maker("system", system_prompt)] if system_prompt else []
+        # System prompts are stripped once so the request prefix is byte-stable across turns
+        self.system_prompt = [self.message_maker("system", system_prompt.strip())] if system_prompt else []
+        self._prefix: Tuple[Dict[str, str], ...] = tuple(self.system_prompt)
+        # Conversation state is per instance, agents never share history
+        self.history: List[Dict[str, str]] = []
         self.model_role = model_role
         self.functions = functions
         self.logger = logger or logging.getLogger(__name__)
@@ -76,30 +225,88 @@ class MultiModelAgent:
         self.process_type = process_type
         self.voice = voice
 
-        # Load environment variables for API keys
-        dotenv_path = ".env"
-        load_dotenv(dotenv_path)
-
         # Model selection logic
         if "gpt" in model_name.lower() or "tts" in model_name.lower():
             api_key = os.getenv('OPENAI_AI_KEY')
             if not api_key:
                 raise ValueError("OPENAI_AI_KEY not found in environment variables")
-            self.client_model = OpenAI(api_key=api_key)
             self.model_type = AIModelType.CHATGPT
+            base_url = None
         elif "qwen" in model_name.lower():
             api_key = os.getenv('QWEN_AI_KEY')
             if not api_key:
                 raise ValueError("QWEN_AI_KEY not found in environment variables")
-            self.client_model = OpenAI(
-                api_key=api_key,
-                base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
-            )
             self.model_type = AIModelType.QWEN
+            base_url = QWEN_BASE_URL
         else:
             raise ValueError(f"Unrecognized model: {model_name}")
+        self._api_key = api_key
+        self._base_url = base_url
 
-        self.logger.info(f"Model {model_name} initialized")
+        self.logger.info("Model %s initialized", model_name)
+
+    @property
+    def client_model(self) -> AsyncOpenAI:
+        """
+        The shared API client, looked up on every use so that agents outliving
+        close_http_client() pick up the new connection pool instead of the closed one.
+        """
+        return _get_client(self.model_type, self._api_key, self._base_url)
+
+    def private_client(self, http_client: httpx.AsyncClient) -> AsyncOpenAI:
+        """
+        Build an API client for this agent's provider on the given HTTP client, outside the shared pool.
+        Meant for code running on its own event loop, which must not use the shared pool's connections.
+
+        Args:
+            http_client (httpx.AsyncClient): HTTP client owned and closed by the caller.
+
+        Returns:
+            AsyncOpenAI: The private client.
+        """
+        return AsyncOpenAI(api_key=self._api_key, base_url=self._base_url, max_retries=0, http_client=http_client)
+
+    @classmethod
+    @lru_cache(maxsize=32)
+    def get(
+        cls,
+        model_name: str,
+        system_prompt: Optional[str] = None,
+        process_type: ProcessType = ProcessType.INSTRUCT,
+        logger: Optional[logging.Logger] = None
+    ) -> "MultiModelAgent":
+        """
+        Return an agent shared by every caller asking for the same model, system prompt and process type.
+        Shared agents keep no conversation context; use the constructor for agents holding history.
+
+        Args:
+            model_name (str): Name of the model to use.
+            system_prompt (Optional[str]): System prompt for the model.
+            process_type (ProcessType): Type of process (INSTRUCT, TTS, etc.).
+            logger (Optional[logging.Logger]): Logger instance.
+
+        Returns:
+            MultiModelAgent: The shared agent.
+        """
+        return cls(model_name=model_name, system_prompt=system_prompt, process_type=process_type, logger=logger)
+
+    async def warm_up(self, connections: int = 4) -> None:
+        """
+        Open connections to the model endpoint ahead of the first user request,
+        so it does not pay for the TCP and TLS handshakes.
+
+        Args:
+            connections (int): Number of concurrent warm-up requests.
+        """
+        results = await asyncio.gather(
+            *(self.client_model.models.list() for _ in range(connections)),
+            return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            self.logger.warning("Connection warm-up for %s failed: %s", self.model_name, errors[0])
+        else:
+            self.logger.info("Connections to %s endpoint warmed up", self.model_name)
 
     @staticmethod
     def message_maker(role: str, content: Optional[str]) -> Dict[str, str]:
@@ -119,7 +326,8 @@ class MultiModelAgent:
         """
         Add a system prompt to the conversation history.
         """
-        self.system_prompt.append(self.message_maker("system", system_prompt))
+        self.system_prompt.append(self.message_maker("system", system_prompt.strip()))
+        self._prefix = tuple(self.system_prompt)
 
     async def assist_user(
         self, 
@@ -133,18 +341,14 @@ class MultiModelAgent:
         Get a response from the model for a given question.
         Used by the WebSocket server to process incoming messages.
         """
-        self.logger.info(f"Model {self.model_role} asked: \n {question}")
+        self.logger.info("Model %s asked: \n %s", self.model_role, question)
 
         if self.model_type == AIModelType.CHATGPT or self.model_type == AIModelType.QWEN:
             if self.process_type == ProcessType.INSTRUCT:
-                if self.with_context:
-                    content = cast(List[ChatCompletionMessageParam], 
-                        self.system_prompt + self.history + [{"role": "user", "content": question}])
-                else:
-                    content = cast(List[ChatCompletionMessageParam], 
-                        self.system_prompt + [self.message_maker("user", question)])
-
-        result = self.client_model.chat.completions.create(
+                content = self._build_messages(question)
+
+        result = await call_with_retry(
+            self.client_model.chat.completions.create,
             model=self.model_name,
             messages=content,
             temperature=temperature,
@@ -156,10 +360,63 @@ class MultiModelAgent:
 
         # Storing conversation history to keep context of conversation
         if self.with_context:
-            self.history = self.history + [
-                {"role": "user", "content": question},
-                {"role": "assistant", "content": answer}
-            ]
+            self.history.append({"role": "user", "content": question})
+            self.history.append({"role": "assistant", "content": answer})
 
-        logger.debug(f"Model {self.model_role} answered: \n {answer}")
-        return [{"role": self.model_role}, {"content": answer}]
\ No newline at end of file
+        logger.debug("Model %s answered: \n %s", self.model_role, answer)
+        return [{"role": self.model_role}, {"content": answer}]
+
+    async def assist_user_stream(
+        self, 
+        question: str, 
+        temperature: float = 0.5, 
+        max_tokens: int = 500, 
+        top_p: float = 0.7, 
+        seed: int = 69
+    ) -> AsyncIterator[str]:
+        """
+        Stream the model's answer for a given question as text deltas.
+        Lets the voice service start TTS on the first sentence while the rest is generated.
+        The full answer is stored in the conversation history once the stream completes.
+        """
+        self.logger.info("Model %s asked: \n %s", self.model_role, question)
+
+        # call_with_retry drops the SDK's stream=True overload, restore the streaming result type
+        stream = cast(AsyncStream[ChatCompletionChunk], await call_with_retry(
+            self.client_model.chat.completions.create,
+            model=self.model_name,
+            messages=self._build_messages(question),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            seed=seed,
+            stream=True
+        ))
+        parts: List[str] = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        answer = "".join(parts)
+
+        # Storing conversation history to keep context of conversation
+        if self.with_context:
+            self.history.append({"role": "user", "content": question})
+            self.history.append({"role": "assistant", "content": answer})
+
+        logger.debug("Model %s answered: \n %s", self.model_role, answer)
+
+    def _build_messages(self, question: str) -> List[ChatCompletionMessageParam]:
+        """
+        Build the chat messages for a question: system prompt prefix, history and the user turn.
+        """
+        # The system prompt prefix is identical on every turn, which lets the
+        # provider reuse its prompt cache for it
+        messages: List[Dict[str, str]] = list(self._prefix)
+        if self.with_context:
+            messages.extend(self.history)
+        messages.append(self.message_maker("user", question))
+        return cast(List[ChatCompletionMessageParam], messages)
\ No newline at end of file
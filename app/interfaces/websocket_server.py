@@ -4,6 +4,7 @@ WebSocket server for handling voice answer requests.
 
 import asyncio
 import json
+import socket
 import logging
 from typing import Optional, Dict, Any, List, Callable, Awaitable
 import websockets
@@ -11,6 +12,34 @@ from websockets.server import WebSocketServerProtocol
 
 logger = logging.getLogger(__name__)
 
+# Audio answers are streamed as binary frames of this size, followed by the END_OF_AUDIO text frame
+AUDIO_CHUNK_SIZE = 64 * 1024
+END_OF_AUDIO = json.dumps({"event": "end_of_audio"})
+# Kernel send buffer per connection, room for several audio chunks in flight
+SEND_BUFFER_SIZE = 4 << 20
+# High-water mark of the websockets read and write buffers, a few audio chunks before flow control kicks in
+BUFFER_LIMIT = 1 << 20
+
+def tune_socket(websocket: WebSocketServerProtocol) -> None:
+    """
+    Disable Nagle's algorithm and, where supported, delayed ACKs on a connection socket,
+    and enlarge its send buffer for the bulk audio answer.
+    A small question followed by a bulk audio answer is the pattern both of them slow down.
+
+    Args:
+        websocket (WebSocketServerProtocol): The WebSocket connection.
+    """
+    sock = websocket.transport.get_extra_info("socket") if websocket.transport else None
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, "TCP_QUICKACK"):  # Linux only
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+    except OSError as e:
+        logger.debug("Could not tune client socket: %s", e)
+
 class WebSocketServer:
     """WebSocket server for handling voice answer requests."""
     
@@ -40,6 +69,7 @@ class WebSocketServer:
         Args:
             websocket (WebSocketServerProtocol): The WebSocket connection.
         """
+        tune_socket(websocket)
         try:
             async for message in websocket:
                 try:
@@ -52,22 +82,28 @@ class WebSocketServer:
                 except json.JSONDecodeError:
                     await websocket.send(json.dumps({"error": "Invalid JSON format"}))
                 except Exception as e:
-                    logger.error(f"Error processing message: {str(e)}")
+                    logger.error("Error processing message: %s", e)
                     await websocket.send(json.dumps({"error": str(e)}))
                     
         except websockets.exceptions.ConnectionClosed:
             logger.info("Client connection closed")
         except Exception as e:
-            logger.error(f"Error handling client: {str(e)}")
+            logger.error("Error handling client: %s", e)
 
     async def start(self) -> None:
-        """Start the WebSocket server."""
+        """
+        Start the WebSocket server.
+        Answers are MP3 audio, which is already compressed, so permessage-deflate is disabled.
+        """
         self.server = await websockets.serve(
             self.handle_client,
             self.host,
-            self.port
+            self.port,
+            compression=None,
+            read_limit=BUFFER_LIMIT,
+            write_limit=BUFFER_LIMIT
         )
-        logger.info(f"WebSocket server started on ws://{self.host}:{self.port}")
+        logger.info("WebSocket server started on ws://%s:%s", self.host, self.port)
         await self.server.wait_closed()
 
     async def stop(self) -> None:
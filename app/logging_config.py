@@ -0,0 +1,31 @@
+"""
+logging_config.py
+-----------------
+One-time logging configuration for the voice service entry points.
+"""
+import logging
+from typing import Optional, List
+
+_CONFIGURED = False
+
+def setup(level: int = logging.DEBUG, log_file: Optional[str] = None) -> None:
+    """
+    Configure the root logger once, later calls are no-ops so handlers never stack up.
+
+    Args:
+        level (int): Root logging level.
+        log_file (Optional[str]): Also write logs to this file when set.
+    """
+    global _CONFIGURED
+    if _CONFIGURED:
+        return
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=handlers
+    )
+    _CONFIGURED = True
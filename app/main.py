@@ -1,15 +1,24 @@
 from app.services.service_voice_answer import VoiceAnswerService
+from app import logging_config
 import logging
 import asyncio
+from types import ModuleType
+from typing import Optional
+
+uvloop: Optional[ModuleType]
+try:
+    # uvloop's libuv-based event loop speeds up socket I/O; it is POSIX-only
+    import uvloop as _uvloop
+    uvloop = _uvloop
+except ImportError:
+    uvloop = None
 
 if __name__ == "__main__":
     # Configure logging
-    log_file = "./app/logs/voice_service.log"
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    logging_config.setup(level=logging.DEBUG)
     logger = logging.getLogger(__name__)
     voice_answer = VoiceAnswerService(logger)
-    asyncio.run(voice_answer.run())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(voice_answer.run())
+    else:
+        asyncio.run(voice_answer.run())
\ No newline at end of file
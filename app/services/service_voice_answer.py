@@ -3,25 +3,48 @@ voice_answer.py
 --------------
 Main service for handling voice-based answers using LLM and TTS.
 """
+import re
+import json
+import textwrap
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List, Union
-from websockets.server import ServerProtocol
+from typing import Optional, Dict, Any, List, Union, AsyncIterator, cast
+from websockets.server import WebSocketServerProtocol
 
-from app.interfaces.websocket_server import WebSocketServer
-from app.agents.class_agents import MultiModelAgent, ProcessType
+from app.interfaces.websocket_server import WebSocketServer, AUDIO_CHUNK_SIZE, END_OF_AUDIO
+from app.agents.class_agents import MultiModelAgent, ProcessType, close_http_client
 from app.agents.agent_tss import TTSAgent
 
+__all__ = ["VoiceAnswerService"]
+
+# Whitespace following sentence-ending punctuation, where the streamed answer is cut for TTS
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Whitespace following a clause separator, where a sentence buffered for too long is cut early
+CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+# Seconds a partial sentence may wait for its end before its complete clauses are sent to TTS
+FLUSH_AFTER = 0.2
+# Sentences and audio chunks each stage may run ahead of the next one before it waits
+PIPELINE_DEPTH = 8
+
+# Sent verbatim as the first message of every request, a byte-identical prefix lets the API reuse its prompt cache
+_SYSTEM_PROMPT = textwrap.dedent(
+    """
+    You are a helpful smart and pleasant assistant intended to kindly answer
+    any kind of question with versatile literature erudition and light futuristic touch.
+    """
+).strip()
 
 class VoiceAnswerService:
-    system_prompt_assistant = (
-            """
-            You are a helpful smart and pleasant assistant intended to kindly answer 
-            any kind of question with versatile literature erudition and light futuristic touch.
-            """
-            )
-    def __init__(self, logger: Optional[logging.Logger] = None) -> None:
+    """
+    Answers spoken questions: streams the LLM answer, converts it to speech and sends the audio back.
+    The system prompt is the module constant _SYSTEM_PROMPT, identical for every instance and request.
+    """
+    system_prompt_assistant = _SYSTEM_PROMPT
+    def __init__(self, logger: Optional[logging.Logger] = None, max_concurrent_answers: int = 8) -> None:
         self.logger = logger or logging.getLogger(__name__)
         self.model_assistant = "gpt-4.1"
+        # Caps the answers generated at once across all clients, each one holds an LLM stream and TTS calls
+        self.concurrency_sem = asyncio.Semaphore(max_concurrent_answers)
 
         self.agent_assistant = MultiModelAgent(
             system_prompt=self.system_prompt_assistant,
@@ -37,20 +60,124 @@ class VoiceAnswerService:
             message_handler=self.handle_message
         )
 
-    async def handle_message(self, websocket: ServerProtocol, message: str) -> None:
+    async def handle_message(self, websocket: WebSocketServerProtocol, message: str) -> None:
         
         # 1. Receiving the message from the socket
-        self.logger.info(f"Received message: {message}")
-        # 2. Get answer from LLM in the text format
-        answer = await self.agent_assistant.assist_user(question=message)
-        # 3. Convert answer to audio on the external service
-        audio_data = await self.tts_agent.transform_text_to_speech(answer[1]["content"])
-        # 4. Send audio back to the client
-        if audio_data:
-            await websocket.send(audio_data)
-            self.logger.info("Audio data sent to client.")
+        self.logger.info("Received message: %s", message)
+        # 2. Stream the answer from the LLM and cut it into sentences
+        # 3. Convert each sentence to audio on the external service as soon as it is complete
+        # 4. Send the audio back in sentence order as it streams from TTS, while later sentences are still generated
+        async with self.concurrency_sem:
+            sent_bytes = await self._answer(websocket, message)
+
+        if sent_bytes:
+            await websocket.send(END_OF_AUDIO)
+            self.logger.info("Audio data sent to client: %d bytes", sent_bytes)
         else:
             self.logger.error("Failed to generate audio data")
+            await websocket.send(json.dumps({"error": "Failed to generate audio data"}))
+
+    async def _answer(self, websocket: WebSocketServerProtocol, message: str) -> int:
+        """
+        Generate the spoken answer to a message and stream it to the client.
+
+        Returns:
+            int: Number of audio bytes sent.
+        """
+        sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        audio_chunks: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        sender = asyncio.create_task(self._send_audio(websocket, audio_chunks))
+        tasks = [
+            asyncio.create_task(self._produce_sentences(message, sentences)),
+            asyncio.create_task(self._synthesize_sentences(sentences, audio_chunks)),
+            sender,
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return sender.result()
+
+    @staticmethod
+    async def _split_sentences(deltas: AsyncIterator[str], flush_after: float = FLUSH_AFTER) -> AsyncIterator[str]:
+        """
+        Regroup streamed text deltas into complete sentences.
+        A sentence still open after flush_after seconds is cut after its last complete clause,
+        so a long sentence starts playing early without sending single tokens to TTS.
+        """
+        loop = asyncio.get_running_loop()
+        buffer = ""
+        started = loop.time()
+        async for delta in deltas:
+            if not buffer:
+                started = loop.time()
+            buffer += delta
+            *sentences, buffer = SENTENCE_END.split(buffer)
+            for sentence in sentences:
+                yield sentence
+            if sentences:
+                started = loop.time()
+            elif buffer and loop.time() - started >= flush_after:
+                clause_end = None
+                for clause_end in CLAUSE_END.finditer(buffer):
+                    pass
+                if clause_end is not None:
+                    yield buffer[:clause_end.start()]
+                    buffer = buffer[clause_end.end():]
+                    started = loop.time()
+        if buffer.strip():
+            yield buffer
+
+    async def _produce_sentences(self, message: str, sentences: "asyncio.Queue[Optional[str]]") -> None:
+        """
+        Stream the LLM answer into the sentence queue, closing it with None.
+        """
+        deltas = self.agent_assistant.assist_user_stream(question=message)
+        async for sentence in self._split_sentences(deltas):
+            await sentences.put(sentence)
+        await sentences.put(None)
+
+    async def _synthesize_sentences(
+        self,
+        sentences: "asyncio.Queue[Optional[str]]",
+        audio_chunks: "asyncio.Queue[Optional[bytes]]"
+    ) -> None:
+        """
+        Stream the audio of each queued sentence in order into the audio queue, closing it with None.
+        """
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                await audio_chunks.put(None)
+                return
+            async for chunk in self.tts_agent.stream_text_to_speech(sentence):
+                await audio_chunks.put(chunk)
+
+    async def _send_audio(self, websocket: WebSocketServerProtocol, audio_chunks: "asyncio.Queue[Optional[bytes]]") -> int:
+        """
+        Forward queued audio to the client in chunks until the queue is closed.
+
+        Returns:
+            int: Number of audio bytes sent.
+        """
+        sent_bytes = 0
+        while True:
+            audio_data = await audio_chunks.get()
+            if audio_data is None:
+                return sent_bytes
+            # Slices of a memoryview share the buffer, cached answers are not copied chunk by chunk.
+            # send() accepts any bytes-like object, its type hints only list bytes
+            view = memoryview(audio_data)
+            for offset in range(0, len(view), AUDIO_CHUNK_SIZE):
+                await websocket.send(cast(bytes, view[offset:offset + AUDIO_CHUNK_SIZE]))
+            sent_bytes += len(view)
 
     async def run(self) -> None:
-        await self.server.start()
+        try:
+            # LLM and TTS share the connection pool, one warm-up covers both
+            await self.agent_assistant.warm_up()
+            await self.server.start()
+        finally:
+            await close_http_client()
@@ -1,46 +1,47 @@
 """
 playaudio.py
 ------------
-Utility for playing audio data using pygame.
+Utility for playing audio data using miniaudio.
 """
 
-import pygame
-import tempfile
-import os
+import asyncio
+import threading
+import miniaudio
 
 def play_audio(audio_data):
     """
-    Play audio data directly from memory using pygame
-    
+    Play audio data directly from memory using miniaudio
+
     Args:
         audio_data (bytes): The audio data to play
     """
     print(f"Attempting to play audio data of size: {len(audio_data)} bytes")
 
-    # Initialize pygame mixer
-    pygame.mixer.init()
-    print("Pygame mixer initialized")
+    playback_done = threading.Event()
     try:
-        # Create a temporary file for the audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-        
-        # Load and play the audio using pygame
-        pygame.mixer.music.load(temp_file_path)
-        pygame.mixer.music.play()
-        
-        # Wait for the audio to finish playing
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
-        
+        # Decode the audio in-process from memory, no temporary file involved
+        stream = miniaudio.stream_memory(audio_data)
+        callbacks_stream = miniaudio.stream_with_callbacks(stream, end_callback=playback_done.set)
+        next(callbacks_stream)  # prime the generator before handing it to the device
+
+        with miniaudio.PlaybackDevice() as device:
+            device.start(callbacks_stream)
+            # Wait for the end-of-stream callback instead of polling the device
+            playback_done.wait()
+
         print("Audio playback completed successfully")
-        
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
-        
+
     except Exception as e:
         print(f"Error playing audio: {str(e)}")
-    finally:
-        # Stop any playing audio
-        pygame.mixer.music.stop()
\ No newline at end of file
+
+
+async def play_audio_async(audio_data):
+    """
+    Play audio data without blocking the event loop, so the caller can keep
+    receiving while the sound plays
+
+    Args:
+        audio_data (bytes): The audio data to play
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, play_audio, audio_data)
@@ -3,10 +3,52 @@ TCP Audio Client (WebSocket version)
 -----------------------------------
 A Gradio-based client for sending questions to a WebSocket server and receiving audio responses.
 """
+import json
+import socket
+import asyncio
 import logging
-import tempfile
 import gradio as gr
 import websockets
+from types import ModuleType
+from typing import Optional
+
+uvloop: Optional[ModuleType]
+try:
+    # uvloop's libuv-based event loop speeds up socket I/O; it is POSIX-only
+    import uvloop as _uvloop
+    uvloop = _uvloop
+except ImportError:
+    uvloop = None
+
+# Text frame sent by the server after the last binary audio chunk
+END_OF_AUDIO = json.dumps({"event": "end_of_audio"})
+# Kernel receive buffer for the connection, room for several audio chunks in flight
+RECEIVE_BUFFER_SIZE = 4 << 20
+# Largest message accepted from the server, audio arrives in 64 KiB chunks well below it
+MAX_FRAME_SIZE = 16 << 20
+# High-water mark of the websockets read and write buffers, a few audio chunks before flow control kicks in
+BUFFER_LIMIT = 1 << 20
+# Seconds between keepalive pings on the idle connection, keeps NAT and proxy mappings open
+PING_INTERVAL = 20
+
+def tune_socket(websocket):
+    """
+    Disable Nagle's algorithm and, where supported, delayed ACKs on the connection socket,
+    and enlarge its receive buffer for the audio answer.
+
+    Args:
+        websocket (websockets.WebSocketClientProtocol): The WebSocket connection.
+    """
+    sock = websocket.transport.get_extra_info("socket") if websocket.transport else None
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, "TCP_QUICKACK"):  # Linux only
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+    except OSError:
+        pass
 
 class WebSocketClient:
     """
@@ -24,27 +66,80 @@ class WebSocketClient:
         self.host = host
         self.port = port
         self.logger = logger
+        # One connection is kept open across questions, the lock keeps their answers from interleaving
+        self._ws = None
+        self._uri = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        """
+        Return the open connection to the server, (re)connecting when it was closed or the target changed.
+
+        Returns:
+            websockets.WebSocketClientProtocol: The WebSocket connection.
+        """
+        uri = f"ws://{self.host}:{self.port}"
+        if self._ws is not None and (self._ws.closed or self._uri != uri):
+            await self._disconnect()
+        if self._ws is None:
+            self._ws = await websockets.connect(
+                uri,
+                max_size=MAX_FRAME_SIZE,
+                read_limit=BUFFER_LIMIT,
+                write_limit=BUFFER_LIMIT,
+                compression=None,
+                ping_interval=PING_INTERVAL
+            )
+            self._uri = uri
+            tune_socket(self._ws)
+        return self._ws
+
+    async def _disconnect(self):
+        """
+        Close the connection to the server, if any.
+        """
+        websocket, self._ws = self._ws, None
+        if websocket is not None:
+            await websocket.close()
 
     async def send_question(self, question):
         """
         Send a question to the server and receive the audio response (as binary).
         """
-        uri = f"ws://{self.host}:{self.port}"
-        try:
-            async with websockets.connect(uri, max_size=None) as websocket:
-                # 1. Receive the text from the UI and sends it to the server
-                await websocket.send(question)
-                self.logger.info(f"Sent question: {question}")
-                # 2. Receive the audio from the server
-                audio_data = await websocket.recv()  # Should be bytes
-                self.logger.info(f"Received audio data: {len(audio_data)} bytes")
-                # 3. Receives the audio data and provides for it for playing in the UI.
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                    temp_file.write(audio_data)
-                    return temp_file.name
-        except Exception as e:
-            self.logger.error(f"WebSocket error: {str(e)}")
-            return None
+        async with self._lock:
+            # A connection the server dropped while idle is only noticed on use, retry once on a new one
+            for attempt in range(2):
+                chunks = []
+                try:
+                    websocket = await self._connect()
+                    # 1. Receive the text from the UI and sends it to the server
+                    await websocket.send(question)
+                    self.logger.info("Sent question: %s", question)
+                    # 2. Receive the audio from the server as a stream of binary chunks
+                    # 3. Join the chunks in memory and hand the bytes to the UI for playing, no temporary file involved
+                    while True:
+                        frame = await websocket.recv()
+                        if isinstance(frame, str):
+                            # Text frames carry control messages: end of audio or an error
+                            if frame == END_OF_AUDIO:
+                                break
+                            self.logger.error("Server error: %s", frame)
+                            return None
+                        chunks.append(frame)
+                    audio_data = b"".join(chunks)
+                    self.logger.info("Received audio data: %d bytes", len(audio_data))
+                    return audio_data
+                except websockets.exceptions.ConnectionClosed as e:
+                    await self._disconnect()
+                    if attempt or chunks:
+                        self.logger.error("WebSocket error: %s", e)
+                        return None
+                except Exception as e:
+                    # The connection may still carry the rest of this answer, start the next question on a new one
+                    await self._disconnect()
+                    self.logger.error("WebSocket error: %s", e)
+                    return None
+        return None
 
     async def send_message(self, message, host, port):
         """
@@ -56,7 +151,7 @@ class WebSocketClient:
             port (int): Server port.
 
         Returns:
-            tuple: (status message, audio file path or None)
+            tuple: (status message, audio bytes or None)
         """
         try:
             # Update client connection details
@@ -64,9 +159,9 @@ class WebSocketClient:
             self.port = int(port)
             
             # Send message and get audio response
-            audio_file = await self.send_question(message)
-            if audio_file:
-                return "Message sent successfully! Playing audio response.", audio_file
+            audio_data = await self.send_question(message)
+            if audio_data:
+                return "Message sent successfully! Playing audio response.", audio_data
             else:
                 return "Error: Failed to get audio response", None
         except Exception as e:
@@ -136,6 +231,10 @@ def main():
     )
     logger = logging.getLogger(__name__)
     logger.info("Starting WebSocket Client...")
+
+    # Event loops created from here on, including the one Gradio runs handlers on, use uvloop
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     
     # Create client and launch UI
     client = WebSocketClient(logger=logger)
@@ -2,14 +2,37 @@
 Pytest configuration file for async tests.
 """
 
+import asyncio
+from types import ModuleType
+from typing import Optional
+
 import pytest
 
+uvloop: Optional[ModuleType]
+try:
+    # uvloop's libuv-based event loop speeds up socket I/O; it is POSIX-only
+    import uvloop as _uvloop
+    uvloop = _uvloop
+except ImportError:
+    uvloop = None
+
 # Configure pytest to use asyncio
 pytest_plugins = ("pytest_asyncio",)
 
+# Event loops created for the async tests run on uvloop when it is installed
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """One event loop for the session, so session-scoped connections outlive a single test."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
+
 # Set default timeout for async tests
 def pytest_configure(config):
     config.addinivalue_line(
         "markers",
         "asyncio: mark test as async"
-    ) 
\ No newline at end of file
+    )
@@ -0,0 +1,117 @@
+"""
+Unit tests for MultiModelAgent state handling.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.agents import class_agents
+from app.agents.class_agents import MultiModelAgent, ProcessType, RateLimiter, call_with_retry, close_http_client
+
+
+def test_history_is_per_instance(monkeypatch):
+    """Conversation history of one agent never leaks into another."""
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    first = MultiModelAgent(model_name="gpt-4.1", with_context=True)
+    second = MultiModelAgent(model_name="gpt-4.1", with_context=True)
+
+    first.history.append({"role": "user", "content": "Your name is Lora"})
+
+    assert second.history == []
+    assert "history" not in vars(MultiModelAgent)
+
+
+def test_system_prompt_is_per_instance(monkeypatch):
+    """Adding a system prompt to one agent leaves the others untouched."""
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    first = MultiModelAgent(model_name="gpt-4.1")
+    second = MultiModelAgent(model_name="gpt-4.1")
+
+    first.add_system_prompt("Answer briefly.")
+
+    assert first.system_prompt == [{"role": "system", "content": "Answer briefly."}]
+    assert second.system_prompt == []
+
+
+def test_shared_agent_is_reused(monkeypatch):
+    """get() builds one stateless agent per model and process type."""
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    first = MultiModelAgent.get(model_name="gpt-4o-mini-tts", process_type=ProcessType.TTS)
+    second = MultiModelAgent.get(model_name="gpt-4o-mini-tts", process_type=ProcessType.TTS)
+
+    assert first is second
+    assert not first.with_context
+    assert MultiModelAgent.get(model_name="gpt-4.1") is not first
+
+
+@pytest.mark.asyncio
+async def test_shared_agent_survives_pool_close(monkeypatch):
+    """A shared agent handed out after close_http_client() uses the new pool, not the closed one."""
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    agent = MultiModelAgent.get(model_name="gpt-4o-mini-tts", process_type=ProcessType.TTS)
+    closed = agent.client_model._client
+
+    await close_http_client()
+
+    assert MultiModelAgent.get(model_name="gpt-4o-mini-tts", process_type=ProcessType.TTS) is agent
+    assert closed.is_closed
+    assert not agent.client_model._client.is_closed
+
+
+def test_rate_limiter_works_across_event_loops():
+    """A limiter contended on one event loop keeps working on the next one."""
+    limiter = RateLimiter(rate_limit=1, period=0.01)
+
+    async def contend():
+        await asyncio.gather(limiter.acquire(), limiter.acquire(), limiter.acquire())
+
+    asyncio.run(contend())
+    asyncio.run(contend())
+
+
+def _rate_limit_error():
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/audio/speech"))
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_retries_rate_limits(monkeypatch):
+    """Throttled calls are retried until one succeeds."""
+    monkeypatch.setattr(class_agents.random, "uniform", lambda low, high: 0)
+    attempts = []
+
+    async def call(value):
+        attempts.append(value)
+        if len(attempts) < 3:
+            raise _rate_limit_error()
+        return value
+
+    assert await call_with_retry(call, "audio") == "audio"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_gives_up(monkeypatch):
+    """Retries stop after MAX_RETRIES attempts, other errors are not retried at all."""
+    monkeypatch.setattr(class_agents.random, "uniform", lambda low, high: 0)
+    attempts = []
+
+    async def throttled():
+        attempts.append(1)
+        raise _rate_limit_error()
+
+    async def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(RateLimitError):
+        await call_with_retry(throttled)
+    assert len(attempts) == class_agents.MAX_RETRIES
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        await call_with_retry(broken)
+    assert len(attempts) == 1
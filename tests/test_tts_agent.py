@@ -0,0 +1,272 @@
+"""
+Unit tests for TTSAgent request handling, run against a fake speech API.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+from app.agents.agent_tss import TTSAgent, TTSCache
+from app.agents.class_agents import close_http_client
+
+
+class FakeSpeech:
+    """Stands in for client.audio.speech, recording the input of every request."""
+
+    def __init__(self, audio=b"audio", chunks=(b"au", b"dio"), delay=0.01, error=None):
+        self.audio = audio
+        self.error = error
+        self.chunks = chunks
+        self.delay = delay
+        self.delays = {}
+        self.calls = []
+        self.with_streaming_response = SimpleNamespace(create=self._create_streaming)
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs["input"])
+        await asyncio.sleep(self.delays.get(kwargs["input"], self.delay))
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(content=self.audio)
+
+    @asynccontextmanager
+    async def _create_streaming(self, **kwargs):
+        self.calls.append(kwargs["input"])
+
+        async def iter_bytes(chunk_size):
+            for chunk in self.chunks:
+                await asyncio.sleep(self.delay)
+                yield chunk
+
+        yield SimpleNamespace(iter_bytes=iter_bytes)
+
+
+@pytest_asyncio.fixture
+async def tts(tmp_path, monkeypatch):
+    """A TTSAgent on a private disk cache whose API calls go to a FakeSpeech."""
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    agent = TTSAgent(cache=TTSCache(cache_dir=str(tmp_path)))
+    speech = FakeSpeech()
+    agent.agent_tts_converter = SimpleNamespace(client_model=SimpleNamespace(audio=SimpleNamespace(speech=speech)))
+    yield agent, speech
+    tasks = [task for task in (agent._tts_worker, *agent._batch_tasks) if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_does_not_cancel_waiters(tts):
+    """A waiter on a stream whose consumer goes away makes its own request instead of being cancelled."""
+    agent, speech = tts
+    stream = agent.stream_text_to_speech("Hello there.")
+    assert await stream.__anext__() == b"au"
+
+    waiter = asyncio.create_task(agent.transform_text_to_speech("Hello there."))
+    await asyncio.sleep(0)
+    await stream.aclose()
+
+    assert await waiter == b"audio"
+    assert speech.calls == ["Hello there.", "Hello there."]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_cancel_waiters(tts):
+    """Cancelling the caller that owns a request leaves the callers waiting on it unaffected."""
+    agent, _ = tts
+    owner = asyncio.create_task(agent.transform_text_to_speech("Hello there."))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(agent.transform_text_to_speech("Hello there."))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert await waiter == b"audio"
+    assert owner.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_stream_skips_batch_collector(tts):
+    """Streaming requests go straight to the API without starting the batch collector."""
+    agent, speech = tts
+    chunks = [chunk async for chunk in agent.stream_text_to_speech("Hello there.")]
+
+    assert chunks == [b"au", b"dio"]
+    assert agent._tts_worker is None
+    assert await agent.transform_text_to_speech("Hello there.") == b"audio"
+    assert speech.calls == ["Hello there."]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_phrases_share_one_call(tts):
+    """Concurrent requests for one phrase, spelled differently, make a single upstream call."""
+    agent, speech = tts
+    results = await asyncio.gather(
+        *(agent.transform_text_to_speech(text) for text in ["Hello  there.", "Hello there.", " Hello there. "] * 4)
+    )
+
+    assert results == [b"audio"] * 12
+    assert speech.calls == ["Hello there."]
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter(tts):
+    """A failed upstream call is reported to every caller waiting on it and is not cached."""
+    agent, speech = tts
+    speech.error = RuntimeError("speech failed")
+    results = await asyncio.gather(
+        *(agent.transform_text_to_speech("Hello there.") for _ in range(4)),
+        return_exceptions=True
+    )
+
+    assert all(result is speech.error for result in results)
+    assert speech.calls == ["Hello there."]
+
+    speech.error = None
+    assert await agent.transform_text_to_speech("Hello there.") == b"audio"
+    assert len(speech.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_and_disk_hits_skip_the_api(tts, tmp_path):
+    """Phrases already synthesized are served from memory, then from disk for a new agent."""
+    agent, speech = tts
+    assert await agent.transform_text_to_speech("Hello there.") == b"audio"
+    assert await agent.transform_text_to_speech("Hello there.") == b"audio"
+
+    fresh = TTSAgent(cache=TTSCache(cache_dir=str(tmp_path)))
+    fresh.agent_tts_converter = agent.agent_tts_converter
+    chunks = [chunk async for chunk in fresh.stream_text_to_speech("Hello there.")]
+
+    assert chunks == [b"audio"]
+    assert speech.calls == ["Hello there."]
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_runs_off_the_event_loop(tts, monkeypatch):
+    """Disk cache reads and writes run in worker threads, never on the event loop thread."""
+    agent, _ = tts
+    threads = []
+    for name in ("get", "put"):
+        method = getattr(agent.cache, name)
+
+        def record(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+
+        monkeypatch.setattr(agent.cache, name, record)
+
+    assert await agent.transform_text_to_speech("Hello there.") == b"audio"
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_evicts_least_recently_used(tts):
+    """The in-memory LRU keeps the most recently used phrases up to its size."""
+    agent, _ = tts
+    agent._mem_max = 2
+    for text in ("One.", "Two.", "One.", "Three."):
+        await agent.transform_text_to_speech(text)
+
+    assert [key[-1] for key in agent._mem_cache] == ["One.", "Three."]
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_are_dispatched_in_batches(tts):
+    """Requests queued together are dispatched in batches of at most max_batch."""
+    agent, speech = tts
+    agent.max_batch = 3
+    batch_sizes = []
+    dispatch = agent._dispatch_batch
+
+    def record(batch):
+        batch_sizes.append(len(batch))
+        dispatch(batch)
+
+    agent._dispatch_batch = record
+    results = await asyncio.gather(*(agent._synthesize(f"Phrase {i}.", "nova") for i in range(5)))
+
+    assert results == [b"audio"] * 5
+    assert batch_sizes == [3, 2]
+    assert sorted(speech.calls) == [f"Phrase {i}." for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_batched_requests_resolve_independently(tts):
+    """A short phrase is answered as soon as its own request completes, not with its whole batch."""
+    agent, speech = tts
+    speech.delays["Slow."] = 1.0
+    slow = asyncio.create_task(agent._synthesize("Slow.", "nova"))
+    fast = asyncio.create_task(agent._synthesize("Fast.", "nova"))
+
+    done, _ = await asyncio.wait({slow, fast}, return_when=asyncio.FIRST_COMPLETED)
+
+    assert done == {fast}
+    assert not slow.done()
+    slow.cancel()
+
+
+@pytest.mark.asyncio
+async def test_lone_request_is_dispatched_immediately(tts):
+    """A request arriving alone does not wait for more requests to join its batch."""
+    agent, speech = tts
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    assert await agent._synthesize("Hello there.", "nova") == b"audio"
+    assert loop.time() - start < speech.delay + 0.04
+
+
+class _SpeechHandler(BaseHTTPRequestHandler):
+    """Answers every POST with fixed audio over a keep-alive HTTP/1.1 connection."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", "5")
+        self.end_headers()
+        self.wfile.write(b"audio")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def speech_server(monkeypatch):
+    """A local keep-alive speech endpoint the API clients are pointed at."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SpeechHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_AI_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_helper_works_on_every_call(tmp_path, speech_server):
+    """Each text_to_speech call runs its own event loop, pooled connections never outlive it."""
+    agent = TTSAgent(cache=TTSCache(cache_dir=str(tmp_path)))
+
+    assert agent.text_to_speech("First phrase.") == b"audio"
+    assert agent.text_to_speech("Second phrase.") == b"audio"
+
+
+@pytest.mark.asyncio
+async def test_sync_helper_leaves_shared_pool_alone(tmp_path, speech_server):
+    """text_to_speech from a worker thread never uses or closes the service loop's connection pool."""
+    await close_http_client()
+    agent = TTSAgent(cache=TTSCache(cache_dir=str(tmp_path)))
+    pool = agent.agent_tts_converter.client_model._client
+
+    assert await asyncio.to_thread(agent.text_to_speech, "First phrase.") == b"audio"
+    assert await asyncio.to_thread(agent.text_to_speech, "Second phrase.") == b"audio"
+    assert agent.agent_tts_converter.client_model._client is pool
+    assert not pool.is_closed
+    await close_http_client()
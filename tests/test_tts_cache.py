@@ -0,0 +1,44 @@
+"""
+Unit tests for the on-disk TTS audio cache.
+"""
+
+import os
+import time
+
+from app.agents.agent_tss import TTSCache
+
+
+def test_cache_roundtrip(tmp_path):
+    """A stored entry is returned on the next lookup, unknown keys miss."""
+    cache = TTSCache(cache_dir=str(tmp_path))
+    key = cache.make_key("gpt-4o-mini-tts", "nova", "Hello")
+
+    assert cache.get(key) is None
+    cache.put(key, b"audio")
+    assert cache.get(key) == b"audio"
+
+
+def test_cache_key_depends_on_model_voice_and_text():
+    """Each part of the (model, voice, format, text) tuple changes the key."""
+    key = TTSCache.make_key("tts-1", "nova", "Hello")
+
+    assert key.endswith(".mp3")
+    assert key == TTSCache.make_key("tts-1", "nova", "Hello")
+    assert key != TTSCache.make_key("gpt-4o-mini-tts", "nova", "Hello")
+    assert key != TTSCache.make_key("tts-1", "alloy", "Hello")
+    assert key != TTSCache.make_key("tts-1", "nova", "Hello!")
+    assert TTSCache.make_key("tts-1", "nova", "Hello", "opus").endswith(".opus")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Curation removes the oldest entries once the size budget is exceeded."""
+    cache = TTSCache(cache_dir=str(tmp_path), max_bytes=12)
+    cache.put("old.mp3", b"1234567890")
+    past = time.time() - 60
+    os.utime(tmp_path / "old.mp3", (past, past))
+    cache.put("new.mp3", b"ab")
+    cache.put("newest.mp3", b"cd")
+
+    assert cache.get("old.mp3") is None
+    assert cache.get("new.mp3") == b"ab"
+    assert cache.get("newest.mp3") == b"cd"
@@ -0,0 +1,52 @@
+"""
+Unit tests for the voice answer service module.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+from app.services.service_voice_answer import VoiceAnswerService
+
+
+def test_service_import_skips_client_audio_stack():
+    """Importing the server-side service never pulls in playback or UI libraries."""
+    code = (
+        "import sys\n"
+        "import app.services.service_voice_answer\n"
+        "print(','.join(m for m in ('pygame', 'gradio', 'miniaudio') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+
+def test_service_exports_only_the_service():
+    """The module's public surface is the service class."""
+    from app.services import service_voice_answer
+
+    assert service_voice_answer.__all__ == ["VoiceAnswerService"]
+
+
+async def _deltas(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_split_sentences_regroups_deltas():
+    """Streamed deltas are cut at sentence ends, whatever the delta boundaries."""
+    deltas = _deltas("Hello wor", "ld. How are", " you? Fine", ", thanks!")
+    sentences = [s async for s in VoiceAnswerService._split_sentences(deltas, flush_after=60)]
+
+    assert sentences == ["Hello world.", "How are you?", "Fine, thanks!"]
+
+
+@pytest.mark.asyncio
+async def test_split_sentences_flushes_complete_clauses():
+    """A sentence left open past flush_after is cut after its last complete clause."""
+    deltas = _deltas("One, two", " three, four", " five")
+    sentences = [s async for s in VoiceAnswerService._split_sentences(deltas, flush_after=0)]
+
+    assert sentences == ["One,", "two three,", "four five"]